@@ -0,0 +1,413 @@
+import os
+import math
+import ipaddress
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBucketStore:
+    """Token buckets held in a dictionary, private to this process."""
+
+    # Drop buckets that have been idle this long (they are full again by then)
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def take(self, key, capacity, rate, now=None):
+        """
+        Takes one token from the bucket for key.
+
+        Args:
+            key (str): Client identifier
+            capacity (float): Maximum burst size
+            rate (float): Tokens added per second
+            now (float): Current monotonic time, for testing
+
+        Returns:
+            tuple: (allowed, retry_after) where retry_after is in seconds
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._prune(capacity, rate, now)
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def _prune(self, capacity, rate, now):
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        refill_time = capacity / rate if rate > 0 else float('inf')
+        self._buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self._buckets.items()
+            if now - updated < refill_time
+        }
+        self._last_prune = now
+
+
+class SQLiteBucketStore:
+    """Token buckets kept in a local SQLite file, shared by all worker processes on a host."""
+
+    # Delete buckets that have been idle long enough to be full again, as MemoryBucketStore does
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, now=None):
+        """Takes one token from the bucket for key. See MemoryBucketStore.take."""
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            self._prune(conn, capacity, rate, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def _prune(self, conn, capacity, rate, now):
+        # Each worker prunes on its own interval; any of them clears the shared table
+        if now - self._last_prune < self.PRUNE_INTERVAL or rate <= 0:
+            return
+        conn.execute("DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,))
+        self._last_prune = now
+
+
+def _retry_after(tokens, rate):
+    """Whole seconds until the bucket holds one token again."""
+    if rate <= 0:
+        return 60
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class ThreadSlots:
+    """Render slots for the threads of this process only."""
+
+    def __init__(self, count):
+        self.count = count
+        self._semaphore = threading.BoundedSemaphore(count)
+
+    def acquire(self, timeout):
+        """
+        Takes a slot, waiting up to timeout seconds (0 means do not wait).
+
+        Returns:
+            A token to pass to release, or None if no slot was free
+        """
+        if timeout > 0:
+            acquired = self._semaphore.acquire(timeout=timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        return True if acquired else None
+
+    def release(self, token):
+        self._semaphore.release()
+
+
+class FileLockSlots:
+    """
+    Render slots shared by every worker process on a host.
+
+    Each slot is an exclusive flock on a file in directory. The kernel drops the
+    lock when its holder exits, so a crashed worker never leaks a slot.
+    """
+
+    # Seconds between attempts while waiting for a slot
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, directory, count):
+        if fcntl is None:
+            raise RuntimeError("File lock render slots need fcntl (not available on this platform)")
+        self.count = count
+        os.makedirs(directory, exist_ok=True)
+        self._paths = [os.path.join(directory, f"slot-{i}.lock") for i in range(count)]
+
+    def _try_acquire(self):
+        for path in self._paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    def acquire(self, timeout):
+        """Takes a slot, waiting up to timeout seconds. See ThreadSlots.acquire."""
+        deadline = time.monotonic() + timeout
+        while True:
+            fd = self._try_acquire()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(self.POLL_INTERVAL)
+
+    def release(self, token):
+        try:
+            fcntl.flock(token, fcntl.LOCK_UN)
+        finally:
+            os.close(token)
+
+
+class Admission:
+    """
+    Handle for an admitted request.
+
+    Set status to the response status code so the outcome is counted correctly;
+    views usually turn failures into 5xx responses rather than raising.
+    """
+
+    def __init__(self):
+        self.status = None
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted."""
+
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Decides whether a render request may run now.
+
+    Combines a per-client token bucket with a cap on concurrent renders so a single
+    client cannot saturate the CPU-bound document generation for everyone else.
+
+    Args:
+        rate (float): Requests per second refilled into each client's bucket
+        burst (int): Bucket capacity, i.e. the largest burst a client may send
+        max_concurrent (int): Renders allowed to run at once
+        queue_timeout (float): Seconds to wait for a render slot before shedding
+        busy_retry_after (int): Retry-After sent with 503 responses
+        store: Bucket store (MemoryBucketStore if None)
+        slots: Render slots; FileLockSlots to share max_concurrent between all
+            workers on the host (ThreadSlots, i.e. per process, if None)
+    """
+
+    COUNTERS = ("admitted", "rate_limited", "overloaded", "completed", "errored")
+
+    def __init__(self, rate, burst, max_concurrent, queue_timeout=0.0, busy_retry_after=2, store=None,
+                 slots=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.busy_retry_after = busy_retry_after
+        self.store = store or MemoryBucketStore()
+        self.slots = slots or ThreadSlots(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    @contextmanager
+    def admit(self, client_id):
+        """
+        Holds a render slot for the duration of the block.
+
+        Yields an Admission; a status of 500 or above set on it, or an exception
+        raised from the block, counts the render as errored.
+
+        Raises:
+            Rejected: With status 429 when the client is over its rate, or 503 when
+            all render slots are busy
+        """
+        if self.rate > 0:
+            allowed, retry_after = self.store.take(client_id, self.burst, self.rate)
+            if not allowed:
+                self._count("rate_limited")
+                raise Rejected(429, "Too many requests, please slow down", retry_after)
+
+        token = self.slots.acquire(self.queue_timeout)
+        if token is None:
+            self._count("overloaded")
+            raise Rejected(503, "Server is busy generating other documents, please retry shortly",
+                           self.busy_retry_after)
+
+        with self._lock:
+            self._counters["admitted"] += 1
+            self._active += 1
+        admission = Admission()
+        try:
+            yield admission
+        except Exception:
+            self._count("errored")
+            raise
+        else:
+            if admission.status is not None and admission.status >= 500:
+                self._count("errored")
+            else:
+                self._count("completed")
+        finally:
+            with self._lock:
+                self._active -= 1
+            self.slots.release(token)
+
+    def stats(self):
+        """
+        Returns a snapshot of the counters and current load.
+
+        The counters and active renders are for this worker process only, even when
+        slots are shared host-wide; pid identifies which worker answered.
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["active"] = self._active
+        snapshot["pid"] = os.getpid()
+        snapshot["max_concurrent"] = self.max_concurrent
+        snapshot["shed"] = snapshot["rate_limited"] + snapshot["overloaded"]
+        return snapshot
+
+
+def parse_networks(value):
+    """
+    Parses a comma-separated list of addresses or CIDR ranges.
+
+    Returns:
+        list: ip_network objects
+    """
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in (value or '').split(',') if part.strip()]
+
+
+def _in_networks(address, networks):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def _strip_port(address):
+    # Azure App Service includes the client port, e.g. "203.0.113.7:51234"
+    if address.startswith('['):
+        return address[1:address.find(']')]
+    if address.count(':') == 1:
+        return address.split(':')[0]
+    return address
+
+
+def _client_address(request, trusted_proxies):
+    """
+    The client address, taken from X-Forwarded-For only when the peer is a trusted proxy.
+
+    Entries are read from the right, skipping further trusted proxies, so the result
+    is the first address that none of our own proxies vouch for. Anything a client
+    writes into the header itself sits to the left of that and is ignored.
+    """
+    peer = request.remote_addr or 'unknown'
+    if not trusted_proxies or not _in_networks(peer, trusted_proxies):
+        return peer
+
+    forwarded = request.headers.get('X-Forwarded-For') or ''
+    address = peer
+    for entry in reversed(forwarded.split(',')):
+        entry = _strip_port(entry.strip())
+        if not entry:
+            break
+        address = entry
+        if not _in_networks(entry, trusted_proxies):
+            break
+    return address
+
+
+def client_id_from_request(request, header=None, trusted_proxies=None):
+    """
+    Identifies the client for rate limiting.
+
+    Both X-Forwarded-For and the key header are client-controlled unless a proxy we
+    run overwrote them, so they are only read when the connecting peer
+    (request.remote_addr) is in trusted_proxies. The key header is then used in place
+    of the client address, e.g. an API key verified by the gateway; otherwise the
+    client address is used. Without trusted proxies the peer address is always used.
+
+    Args:
+        request: Flask request
+        header (str): Header carrying a verified client key (e.g. an API key)
+        trusted_proxies (list): ip_network objects for proxies allowed to set headers
+    """
+    trusted_proxies = trusted_proxies or []
+    if header and _in_networks(request.remote_addr, trusted_proxies):
+        value = (request.headers.get(header) or '').strip()
+        if value:
+            return 'key:' + value
+    return _client_address(request, trusted_proxies)
+
+
+def limit_renders(controller, header=None, trusted_proxies=None):
+    """
+    Decorator for Flask views that applies admission control.
+
+    See client_id_from_request for header and trusted_proxies.
+
+    Rejected requests get a fast plain-text 429 or 503 response with Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, make_response
+
+            client_id = client_id_from_request(request, header, trusted_proxies)
+            try:
+                with controller.admit(client_id) as admission:
+                    response = make_response(view(*args, **kwargs))
+                    admission.status = response.status_code
+                    return response
+            except Rejected as e:
+                logger.warning("Rejected request from %s: %s %s", client_id, e.status, e.message)
+                return e.message, e.status, {"Retry-After": str(e.retry_after)}
+        return wrapper
+    return decorator
+
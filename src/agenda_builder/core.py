@@ -10,9 +10,10 @@ from datetime import datetime
 from docx.shared import Mm, Inches
 from docx import Document
 from io import BytesIO
+from agenda_builder.schedule import compute_schedule
+from agenda_builder.logos import is_remote_url, get_logo_fetcher
+from agenda_builder.reproducible import normalize_docx
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def find_best_matching_logo(logo_path):
@@ -61,7 +62,7 @@ def find_best_matching_logo(logo_path):
     match_idx = logo_basenames.index(matches[0])
     return all_logo_files[match_idx]
 
-def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
+def create_agenda_doc(data, template_path, output_path=None, logo_path=None, deterministic=False):
     """
     Core function to create an agenda document from JSON data
     
@@ -70,6 +71,7 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
         template_path: Path to the template DOCX file
         output_path: Path to save the output (generated if None)
         logo_path: Path to logo file, URL, or base64 encoded image from frontend
+        deterministic: Produce byte-identical output for identical input
     
     Returns:
         Path to the generated document
@@ -78,8 +80,8 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
     if isinstance(data, str):
         data = json.loads(data)
     
-    logger.info(f"Creating document from template: {template_path}")
-    logger.info(f"Output will be saved to: {output_path}")
+    logger.debug("Creating document from template: %s", template_path)
+    logger.debug("Output will be saved to: %s", output_path)
     
     # Make sure output directory exists
     if output_path:
@@ -101,10 +103,18 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
         "has_logo": False  # Default to no logo
     }
     
+    # Parse agenda item times and expose durations and day totals to the template
+    schedule = compute_schedule(data)
+    context["agenda_items"] = schedule["items"]
+    context["schedule"] = schedule
+    if schedule["overlaps"] or schedule["invalid"]:
+        logger.warning("Agenda schedule has %s overlapping item(s) and %s unparsable time(s)",
+                       len(schedule['overlaps']), len(schedule['invalid']))
+    
     # Handle logo
     temp_logo_path = None
     if logo_path:
-        logger.info(f"Processing logo: {logo_path[:30]}{'...' if len(logo_path) > 30 else ''}")
+        logger.debug("Processing logo: %.30s", logo_path)
         
         # Create logos directory if it doesn't exist
         temp_dir = os.path.abspath(os.path.dirname(output_path) if output_path else os.path.join(os.getcwd(), 'temp'))
@@ -124,11 +134,20 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
                         f.write(image_data)
                     
                     logo_path = temp_logo_path
-                    logger.info(f"Converted base64 logo to file: {logo_path}")
+                    logger.debug("Converted base64 logo to file: %s", logo_path)
                 except Exception as e:
-                    logger.error(f"Error processing base64 logo: {str(e)}")
+                    logger.error("Error processing base64 logo: %s", e)
                     context["has_logo"] = False
             
+            # Download remote logos into the shared logo cache
+            elif is_remote_url(logo_path):
+                fetched_path = get_logo_fetcher().fetch(logo_path)
+                if fetched_path:
+                    logger.debug("Fetched remote logo to: %s", fetched_path)
+                    logo_path = fetched_path
+                else:
+                    logger.warning("Could not fetch remote logo: %s", logo_path)
+            
             # At this point, logo_path should be a file path
             if os.path.exists(logo_path):
                 try:
@@ -138,46 +157,54 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
                     
                     # Add multiple logo format options to increase template compatibility
                     # The template might be expecting any of these formats
-                    context["logo"] = InlineImage(doc, logo_path, width=Mm(50))
+                    # The image's file name ends up in the document XML, so in deterministic
+                    # mode pass the bytes instead of the (temporary, unique) file path
+                    if deterministic:
+                        with open(logo_path, 'rb') as f:
+                            logo_image = BytesIO(f.read())
+                    else:
+                        logo_image = logo_path
+                    context["logo"] = InlineImage(doc, logo_image, width=Mm(50))
                     context["company_logo"] = context["logo"]  # Alternative name
                     context["logo_image"] = context["logo"]    # Another alternative
                     context["has_logo"] = True
-                    logger.info(f"Using file path logo: {logo_path}")
+                    logger.debug("Using file path logo: %s", logo_path)
                 except Exception as e:
-                    logger.error(f"Error creating InlineImage from file: {str(e)}")
+                    logger.error("Error creating InlineImage from file: %s", e)
                     context["has_logo"] = False
             else:
-                logger.warning(f"Logo path not valid or file not found: {logo_path}")
+                logger.warning("Logo path not valid or file not found: %s", logo_path)
         except Exception as e:
-            logger.error(f"Unexpected error in logo processing: {str(e)}")
+            logger.error("Unexpected error in logo processing: %s", e)
             context["has_logo"] = False
     
-    # Inspect the template variables to better understand what's expected
-    try:
-        # Extract template variables to see what it expects
-        template_vars = doc.get_undeclared_template_variables()
-        logger.info(f"Template variables: {template_vars}")
-        
-        # Check if template expects specific logo-related variables
-        logo_related_vars = [var for var in template_vars if 'logo' in var.lower()]
-        if logo_related_vars and context.get("has_logo"):
-            logger.info(f"Logo-related variables in template: {logo_related_vars}")
-            # Ensure all logo-related variables are set
-            for var in logo_related_vars:
-                if var not in context:
-                    context[var] = context.get("logo")
-    except Exception as e:
-        logger.warning(f"Could not inspect template variables: {str(e)}")
+    # Inspect the template variables to map any logo placeholder names; this parses
+    # the whole template, so only do it when there is a logo to place
+    if context.get("has_logo"):
+        try:
+            # Extract template variables to see what it expects
+            template_vars = doc.get_undeclared_template_variables()
+            
+            # Check if template expects specific logo-related variables
+            logo_related_vars = [var for var in template_vars if 'logo' in var.lower()]
+            if logo_related_vars:
+                logger.debug("Logo-related variables in template: %s", logo_related_vars)
+                # Ensure all logo-related variables are set
+                for var in logo_related_vars:
+                    if var not in context:
+                        context[var] = context.get("logo")
+        except Exception as e:
+            logger.warning("Could not inspect template variables: %s", e)
     
     # Render the template with the context
     try:
         doc.render(context)
-        logger.info("Template rendered successfully")
+        logger.debug("Template rendered successfully")
     except Exception as e:
         logger.error("Error rendering template:")
         logger.exception(e)  # <-- log the full traceback
-        logger.error(f"Context keys: {list(context.keys())}")
-        logger.error(f"has_logo value: {context.get('has_logo')}")
+        logger.error("Context keys: %s", list(context.keys()))
+        logger.error("has_logo value: %s", context.get('has_logo'))
         logger.info("Check if your DOCX template has a placeholder like {{ logo }} or {{ company_logo }}")
         
         # Try rendering without the logo as a fallback
@@ -210,14 +237,17 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
     # Save the document
     try:
         doc.save(output_path)
-        logger.info(f"Document saved to: {output_path}")
+        logger.info("Document saved to: %s", output_path)
         
         # Explicitly call post-processing with additional logging
-        logger.info("Calling post-processing function...")
+        logger.debug("Calling post-processing function...")
         post_process_result = post_process_document(output_path)
-        logger.info(f"Post-processing completed: {post_process_result}")
+        logger.debug("Post-processing completed: %s", post_process_result)
+        
+        if deterministic:
+            normalize_docx(output_path)
     except Exception as e:
-        logger.error(f"Error saving document: {str(e)}")
+        logger.error("Error saving document: %s", e)
         raise
     
     # Clean up temporary logo file if it exists
@@ -225,7 +255,7 @@ def create_agenda_doc(data, template_path, output_path=None, logo_path=None):
         try:
             os.remove(temp_logo_path)
         except Exception as e:
-            logger.warning(f"Could not remove temporary logo file: {str(e)}")
+            logger.warning("Could not remove temporary logo file: %s", e)
     
     return output_path
 
@@ -235,34 +265,32 @@ def post_process_document(docx_path):
     1. Remove the first column from agenda items table (if needed)
     2. Adjust column widths for better appearance
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Post-processing document: {docx_path}")
+    logger.debug("Post-processing document: %s", docx_path)
     
     try:
         # Open the document
         doc = Document(docx_path)
         
         # Log how many tables exist
-        logger.info(f"Document has {len(doc.tables)} tables")
+        logger.debug("Document has %s tables", len(doc.tables))
         
         # Find the first table with more than one row (header + content)
         agenda_table = None
         for i, table in enumerate(doc.tables):
             if len(table.rows) > 1:  # More than just header row
                 agenda_table = table
-                logger.info(f"Using table #{i+1} with {len(table.rows)} rows and {len(table.columns)} columns")
+                logger.debug("Using table #%s with %s rows and %s columns", i+1, len(table.rows), len(table.columns))
                 break
         
         if agenda_table:
             # Count columns before modification
             original_column_count = len(agenda_table.columns)
-            logger.info(f"Table originally has {original_column_count} columns")
+            logger.debug("Table originally has %s columns", original_column_count)
             
             # Optional: Remove the first column if there are more than 3 columns
             # This is only needed if your template generates an extra column
             if original_column_count > 3:
-                logger.info("Removing first column from table")
+                logger.debug("Removing first column from table")
                 try:
                     for row in agenda_table.rows:
                         # Get the XML element for the row
@@ -270,34 +298,34 @@ def post_process_document(docx_path):
                         # Remove the first cell if it exists
                         if xml_row.tc_lst:
                             xml_row.remove(xml_row.tc_lst[0])
-                    logger.info("First column removed successfully")
+                    logger.debug("First column removed successfully")
                 except Exception as e:
-                    logger.error(f"Error removing first column: {str(e)}")
+                    logger.error("Error removing first column: %s", e)
             
             # Adjust the remaining columns to appropriate widths
             # The number of columns might have changed if we removed the first one
             current_columns = len(agenda_table.columns)
-            logger.info(f"Adjusting widths for {current_columns} columns")
+            logger.debug("Adjusting widths for %s columns", current_columns)
             
             if current_columns >= 3:
                 agenda_table.columns[0].width = Inches(0.8)   # Time column
                 agenda_table.columns[1].width = Inches(1.2)   # Owner column
                 agenda_table.columns[2].width = Inches(4.0)   # Topic/Description column
-                logger.info("Column widths adjusted successfully")
+                logger.debug("Column widths adjusted successfully")
             elif current_columns == 2:
                 agenda_table.columns[0].width = Inches(1.5)   # Time/Owner column
                 agenda_table.columns[1].width = Inches(4.5)   # Topic/Description column
-                logger.info("Column widths adjusted for 2-column table")
+                logger.debug("Column widths adjusted for 2-column table")
             
             # Save the modified document
             doc.save(docx_path)
-            logger.info(f"Document post-processed successfully: {docx_path}")
+            logger.debug("Document post-processed successfully: %s", docx_path)
             return True
         else:
             logger.warning("No suitable table found with more than one row")
             return False
             
     except Exception as e:
-        logger.error(f"Error during post-processing: {str(e)}")
+        logger.error("Error during post-processing: %s", e)
         # Don't fail if post-processing has issues
         return False
\ No newline at end of file
@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import tempfile
+import threading
+import ipaddress
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("LOGO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "agenda-logo-cache"))
+
+# Comma-separated host names logos may be fetched from (subdomains included); empty allows any public host
+DEFAULT_ALLOWED_HOSTS = [h.strip().lower() for h in os.environ.get("LOGO_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+# Redirect hops followed, each one checked like the original URL
+MAX_REDIRECTS = 3
+
+# File extensions for the image types python-docx can embed; SVG is converted to PNG
+IMAGE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/gif": ".gif",
+    "image/bmp": ".bmp",
+    "image/tiff": ".tiff",
+    "image/svg+xml": ".png",
+}
+
+
+def is_remote_url(value):
+    """Returns True if value is an http(s) URL."""
+    return isinstance(value, str) and value.lower().startswith(("http://", "https://"))
+
+
+class BlockedURLError(ValueError):
+    """
+    Raised for logo URLs that point at a host the server must not contact.
+
+    Not an OSError, so urllib3 does not treat a refused peer as a connection
+    failure to retry.
+    """
+
+
+def _is_public_address(address):
+    """Returns True if address is a globally routable unicast IP address."""
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _host_allowed(host, allowed_hosts):
+    return any(host == allowed or host.endswith("." + allowed) for allowed in allowed_hosts)
+
+
+def _guarded_pool_classes():
+    """
+    Connection pool classes that check the address actually connected to.
+
+    Checking the resolved address before the request is not enough on its own: the
+    name could resolve to a different (internal) address when urllib3 connects.
+    """
+    def check_peer(sock):
+        address = sock.getpeername()[0]
+        if not _is_public_address(address):
+            sock.close()
+            raise BlockedURLError(f"Refusing to fetch logo from non-public address {address}")
+        return sock
+
+    class GuardedHTTPConnection(HTTPConnection):
+        def _new_conn(self):
+            return check_peer(super()._new_conn())
+
+    class GuardedHTTPSConnection(HTTPSConnection):
+        def _new_conn(self):
+            return check_peer(super()._new_conn())
+
+    class GuardedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = GuardedHTTPConnection
+
+    class GuardedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = GuardedHTTPSConnection
+
+    return {"http": GuardedHTTPConnectionPool, "https": GuardedHTTPSConnectionPool}
+
+
+class _GuardedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections refuse loopback, private, link-local and reserved peers."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _guarded_pool_classes()
+
+
+def _svg_to_png(svg_data):
+    """
+    Converts SVG bytes to PNG bytes with svglib/reportlab.
+
+    Returns:
+        bytes: PNG data, or None if the conversion is not possible
+    """
+    try:
+        from svglib.svglib import svg2rlg
+        from reportlab.graphics import renderPM
+    except ImportError:
+        logger.warning("svglib/reportlab not installed, cannot convert SVG logo")
+        return None
+
+    fd, svg_path = tempfile.mkstemp(suffix=".svg")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(svg_data)
+        drawing = svg2rlg(svg_path)
+        if drawing is None:
+            return None
+        return renderPM.drawToString(drawing, fmt="PNG")
+    except Exception as e:
+        logger.error("Error converting SVG logo: %s", e)
+        return None
+    finally:
+        os.remove(svg_path)
+
+
+class LogoFetcher:
+    """
+    Downloads remote logo images into a local disk cache.
+
+    Requests go through one pooled HTTP session with timeouts and retries. Cached
+    entries are reused without a request for max_age seconds, then revalidated with
+    If-None-Match/If-Modified-Since so unchanged logos are not downloaded again.
+    The cache keeps at most max_entries logos, evicting the least recently used.
+
+    URLs come from clients, so by default only public hosts are contacted: every
+    URL and redirect hop is resolved and refused if any address is loopback,
+    private, link-local or reserved, and the connected address is checked again.
+
+    Args:
+        cache_dir (str): Directory for cached images and their metadata
+        max_age (int): Seconds a cached logo is used without revalidation
+        timeout (tuple): (connect, read) timeouts in seconds
+        max_bytes (int): Largest image accepted
+        max_workers (int): Concurrent downloads, also the connection pool size
+        max_entries (int): Logos kept in the disk cache
+        allowed_hosts (list): If given, only these hosts and their subdomains are fetched
+        allow_private (bool): Allow non-public addresses, e.g. for a local test server
+    """
+
+    # Locks serializing fetches of the same URL; URLs share them by hash
+    LOCK_STRIPES = 64
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=24 * 3600, timeout=(3.05, 10),
+                 max_bytes=5 * 1024 * 1024, max_workers=8, max_entries=500,
+                 allowed_hosts=None, allow_private=False):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.allowed_hosts = [h.lower() for h in (DEFAULT_ALLOWED_HOSTS if allowed_hosts is None else allowed_hosts)]
+        self.allow_private = allow_private
+        self.session = self._create_session()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="logo-fetch")
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _create_session(self):
+        session = requests.Session()
+        # Proxies from the environment would hide the real peer address from the guard
+        session.trust_env = False
+        retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        adapter_class = HTTPAdapter if self.allow_private else _GuardedAdapter
+        adapter = adapter_class(pool_connections=self.max_workers, pool_maxsize=self.max_workers,
+                                max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = "AgendaBuilder/1.0 (logo fetcher)"
+        return session
+
+    def close(self):
+        """Releases the connection pool and worker threads."""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _lock_for(self, key):
+        return self._locks[int(key[:8], 16) % self.LOCK_STRIPES]
+
+    def check_url(self, url):
+        """
+        Raises BlockedURLError unless url may be fetched.
+
+        Args:
+            url (str): Logo URL or redirect target
+        """
+        try:
+            parts = urlsplit(url)
+        except ValueError as e:
+            raise BlockedURLError(f"Invalid logo URL {url}: {e}")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise BlockedURLError(f"Unsupported logo URL: {url}")
+        host = parts.hostname.lower()
+        if self.allowed_hosts and not _host_allowed(host, self.allowed_hosts):
+            raise BlockedURLError(f"Logo host not in allowlist: {host}")
+        if self.allow_private:
+            return
+        try:
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, ValueError) as e:
+            raise BlockedURLError(f"Could not resolve logo host {host}: {e}")
+        for address in addresses:
+            if not _is_public_address(address):
+                raise BlockedURLError(f"Refusing to fetch logo from non-public address {address} ({host})")
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_meta(self, key):
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(meta.get("path", "")):
+            return None
+        return meta
+
+    def _write_atomic(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _save(self, key, url, response, image_data, content_type):
+        path = os.path.join(self.cache_dir, key + IMAGE_EXTENSIONS[content_type])
+        self._write_atomic(path, image_data)
+        meta = {
+            "url": url,
+            "path": path,
+            "content_type": content_type,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+        self._evict()
+        return path
+
+    def _touch(self, key, meta):
+        meta["fetched_at"] = time.time()
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+
+    def _mark_used(self, key):
+        # The metadata file's mtime records the last use, for least recently used eviction
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Removes the least recently used logos once the cache holds more than max_entries."""
+        with self._evict_lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    meta_path = os.path.join(self.cache_dir, name)
+                    try:
+                        entries.append((os.path.getmtime(meta_path), name[:-len(".json")]))
+                    except OSError:
+                        pass
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort()
+            # Evict down to 90% so the directory is not rescanned on every save
+            for _, key in entries[:len(entries) - int(self.max_entries * 0.9)]:
+                meta = self._load_meta(key)
+                for path in (meta["path"] if meta else None, self._meta_path(key)):
+                    if path:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+
+    def _read_body(self, response):
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _get(self, url, headers):
+        """GETs url, following redirects only to URLs that pass check_url."""
+        for _ in range(MAX_REDIRECTS + 1):
+            self.check_url(url)
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True,
+                                        allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            location = response.headers.get("Location", "")
+            response.close()
+            url = urljoin(url, location)
+        raise requests.TooManyRedirects(f"More than {MAX_REDIRECTS} redirects fetching logo")
+
+    def fetch(self, url):
+        """
+        Returns a local file path for the logo at url, downloading it if needed.
+
+        Args:
+            url (str): http(s) URL of the image
+
+        Returns:
+            str: Path to the cached image, or None if it could not be fetched
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._lock_for(key):
+            meta = self._load_meta(key)
+            if meta and time.time() - meta.get("fetched_at", 0) < self.max_age:
+                self._mark_used(key)
+                return meta["path"]
+
+            headers = {}
+            if meta and meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta and meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+            try:
+                with self._get(url, headers) as response:
+                    if response.status_code == 304 and meta:
+                        self._touch(key, meta)
+                        return meta["path"]
+                    if response.status_code != 200:
+                        logger.warning("Logo fetch failed with status %s: %s", response.status_code, url)
+                        return meta["path"] if meta else None
+
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if content_type not in IMAGE_EXTENSIONS:
+                        logger.warning("Logo URL did not return a supported image (%s): %s", content_type, url)
+                        return None
+
+                    image_data = self._read_body(response)
+                    if image_data is None:
+                        logger.warning("Logo larger than %s bytes: %s", self.max_bytes, url)
+                        return None
+
+                    if content_type == "image/svg+xml":
+                        image_data = _svg_to_png(image_data)
+                        if image_data is None:
+                            return None
+
+                    return self._save(key, url, response, image_data, content_type)
+            except BlockedURLError as e:
+                logger.warning("Blocked logo URL %s: %s", url, e)
+                return None
+            except requests.RequestException as e:
+                logger.warning("Error fetching logo from %s: %s", url, e)
+                # A stale copy is better than no logo
+                return meta["path"] if meta else None
+            except (ValueError, OSError) as e:
+                # Malformed URLs and cache write failures must not fail the render
+                logger.warning("Error fetching logo from %s: %s", url, e)
+                return meta["path"] if meta else None
+
+    def fetch_many(self, urls):
+        """
+        Fetches several logos concurrently.
+
+        Args:
+            urls (list): Image URLs
+
+        Returns:
+            dict: Maps each URL to its cached path, or None if it failed
+        """
+        urls = list(dict.fromkeys(u for u in urls if is_remote_url(u)))
+        futures = [self._executor.submit(self.fetch, url) for url in urls]
+        return {url: future.result() for url, future in zip(urls, futures)}
+
+    def fetch_first(self, urls, timeout=15):
+        """
+        Fetches candidate logos concurrently and returns the most preferred that succeeded.
+
+        Returns as soon as the most preferred candidate still in play succeeds, without
+        waiting for the others; candidates that have not started are cancelled.
+
+        Args:
+            urls (list): Candidate URLs in order of preference, e.g. a logo lookup's
+                logoUrl followed by its additionalResults
+            timeout (float): Seconds to wait in total
+
+        Returns:
+            str: Path to the cached image, or None
+        """
+        urls = list(dict.fromkeys(u for u in urls if is_remote_url(u)))
+        futures = [self._executor.submit(self.fetch, url) for url in urls]
+        deadline = time.monotonic() + timeout
+        try:
+            for future in futures:
+                try:
+                    path = future.result(timeout=max(0, deadline - time.monotonic()))
+                except TimeoutError:
+                    # Too slow: fall back to a less preferred candidate that finished
+                    continue
+                if path:
+                    return path
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_logo_fetcher():
+    """Returns the process-wide LogoFetcher, so all requests share one connection pool."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = LogoFetcher()
+        return _default_fetcher
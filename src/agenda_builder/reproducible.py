@@ -0,0 +1,110 @@
+import os
+import re
+import hashlib
+import logging
+import tempfile
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Earliest timestamp a zip entry can hold; used for every entry so the archive
+# bytes do not depend on when the document was rendered
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Parts Word expects at the start of the package, in this order
+LEADING_PARTS = ["[Content_Types].xml", "_rels/.rels"]
+
+_MEDIA_PART = re.compile(r'^word/media/[^/]+$')
+
+
+def sha256_file(path):
+    """
+    Returns the hex SHA-256 digest of a file.
+
+    Args:
+        path (str): File to hash
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hashed_media_names(parts):
+    """
+    Maps each media part name to a name derived from its content, e.g. word/media/3f2a9c....png.
+
+    Parts with identical content stay separate parts (the package still lists each
+    one), so after the first they get a numbered suffix, in original name order.
+    """
+    renames = {}
+    used = set()
+    for name in sorted(name for name in parts if _MEDIA_PART.match(name)):
+        ext = os.path.splitext(name)[1].lower()
+        base = f"word/media/{hashlib.sha256(parts[name]).hexdigest()[:32]}"
+        new_name, n = f"{base}{ext}", 1
+        while new_name in used:
+            n += 1
+            new_name = f"{base}-{n}{ext}"
+        used.add(new_name)
+        renames[name] = new_name
+    return renames
+
+
+def _rewrite_references(data, renames):
+    """Points relationship targets and content type overrides at renamed media parts."""
+    for old, new in renames.items():
+        old_target, new_target = old[len('word/'):], new[len('word/'):]
+        data = data.replace(f'"{old_target}"'.encode(), f'"{new_target}"'.encode())
+        data = data.replace(f'"/{old}"'.encode(), f'"/{new}"'.encode())
+    return data
+
+
+def normalize_docx(docx_path):
+    """
+    Rewrites a .docx in place so identical content always produces identical bytes.
+
+    - every zip entry gets the same timestamp and permissions
+    - media parts are named after a hash of their content
+    - parts are written in a stable order
+
+    Args:
+        docx_path (str): Path to the .docx file
+
+    Returns:
+        str: SHA-256 digest of the normalized file
+    """
+    with zipfile.ZipFile(docx_path) as source:
+        parts = {info.filename: source.read(info) for info in source.infolist()}
+
+    renames = _hashed_media_names(parts)
+    if renames:
+        parts = {
+            renames.get(name, name): (_rewrite_references(data, renames) if name.endswith(('.rels', '.xml')) else data)
+            for name, data in parts.items()
+        }
+
+    order = [name for name in LEADING_PARTS if name in parts]
+    order += sorted(name for name in parts if name not in LEADING_PARTS)
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(docx_path)), suffix='.docx')
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w') as target:
+            for name in order:
+                info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                info.create_system = 0
+                target.writestr(info, parts[name], compresslevel=6)
+        os.replace(temp_path, docx_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    logger.info("Normalized document for reproducible output: %s", docx_path)
+    return sha256_file(docx_path)
@@ -0,0 +1,314 @@
+import re
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# Sentinel used in the minute arrays for a missing or unparsable time
+NO_TIME = -1
+
+_TIME = r'(\d{1,2})(?:[:.](\d{2}))?(?:[^\S\n]*([AaPp])\.?[^\S\n]*[Mm]\.?(?![A-Za-z]))?'
+
+# One line of the batch buffer: an optional "start [- end]" range followed by anything.
+# Every line produces exactly one match, so match N always belongs to time string N.
+_RANGE_LINE = re.compile(
+    r'^[^\S\n]*(?:' + _TIME + r'(?:[^\S\n]*(?:-|–|—|to)[^\S\n]*' + _TIME + r')?)?[^\n]*$',
+    re.MULTILINE,
+)
+
+
+def _to_minutes(hour, minute, meridiem):
+    """
+    Converts a parsed clock time to minutes after midnight.
+
+    Returns:
+        int: Minutes after midnight, or NO_TIME if the time is out of range
+    """
+    hour = int(hour)
+    minute = int(minute) if minute else 0
+    if minute > 59:
+        return NO_TIME
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return NO_TIME
+        hour = hour % 12 + (12 if meridiem in 'Pp' else 0)
+    elif hour > 23:
+        return NO_TIME
+    return hour * 60 + minute
+
+
+def parse_time_ranges(times):
+    """
+    Parses a batch of free-form agenda time strings in a single regex pass.
+
+    Accepts ranges like "9:30 AM - 10:00 AM", "9:30–10:00 AM" and "13:00 to 14:30",
+    as well as single start times like "10:00 AM". Times without AM/PM are read as
+    24-hour times.
+
+    Args:
+        times (list): Time strings, one per agenda item
+
+    Returns:
+        tuple: Two arrays (starts, ends) of minutes after midnight, with NO_TIME
+        where a value is missing or could not be parsed
+    """
+    starts, ends, _ = _parse_batch(times)
+    return starts, ends
+
+
+def _parse_batch(times):
+    """
+    Does the work of parse_time_ranges.
+
+    Returns:
+        tuple: (starts, ends, has_meridiem), the last a byte array that is 1 where
+        the time string said AM or PM
+    """
+    count = len(times)
+    starts = array('i', [NO_TIME]) * count
+    ends = array('i', [NO_TIME]) * count
+    has_meridiem = array('b', [0]) * count
+    if not count:
+        return starts, ends, has_meridiem
+
+    buffer = '\n'.join(str(t or '').replace('\n', ' ').replace('\r', ' ') for t in times)
+
+    for index, match in enumerate(_RANGE_LINE.finditer(buffer)):
+        if index >= count:
+            break
+        start_hour, start_minute, start_ampm, end_hour, end_minute, end_ampm = match.groups()
+        if start_hour is None:
+            continue
+
+        # A bare hour is only a time when it carries a meridiem ("9 AM", not "Topic 1")
+        if start_minute is None and start_ampm is None and end_ampm is None:
+            continue
+
+        has_meridiem[index] = bool(start_ampm or end_ampm)
+        if end_hour is None:
+            starts[index] = _to_minutes(start_hour, start_minute, start_ampm)
+            continue
+
+        # "9:30 - 10:00 AM" shares the end meridiem with the start
+        start = _to_minutes(start_hour, start_minute, start_ampm or end_ampm)
+        end = _to_minutes(end_hour, end_minute, end_ampm or start_ampm)
+        if start == NO_TIME or end == NO_TIME:
+            continue
+        if end < start:
+            if not start_ampm and end_ampm and start - 720 >= 0:
+                # "11:30 - 12:30 PM": the start belongs to the morning
+                start -= 720
+            elif not start_ampm and not end_ampm and end + 720 > start and end < 720:
+                # "11:30 - 1:00" without any meridiem rolls over into the afternoon
+                end += 720
+        if end < start:
+            continue
+        starts[index] = start
+        ends[index] = end
+
+    return starts, ends, has_meridiem
+
+
+def _resolve_meridiems(starts, ends, has_meridiem, offset, count):
+    """
+    Reads times without AM/PM in an agenda that otherwise uses them as 12-hour times.
+
+    "1:00 - 2:30" among "... PM" items means the afternoon, not 1 AM. Each such
+    time takes the AM or PM reading closest to the previous timed item's end (or,
+    for the first, the next item's start). Without a timed neighbour it cannot be
+    placed and is cleared to NO_TIME, so it is reported as invalid.
+    """
+    indexes = range(offset, offset + count)
+    if not any(has_meridiem[i] for i in indexes):
+        return  # A 24-hour agenda
+
+    for i in indexes:
+        start, end = starts[i], ends[i]
+        # Hours 13-23 and 0 are unambiguous 24-hour times
+        if has_meridiem[i] or start == NO_TIME or not 60 <= start < 780:
+            continue
+
+        reference = None
+        for j in range(i - 1, offset - 1, -1):
+            if starts[j] != NO_TIME:
+                reference = ends[j] if ends[j] != NO_TIME else starts[j]
+                break
+        if reference is None:
+            reference = next((starts[j] for j in range(i + 1, offset + count)
+                              if has_meridiem[j] and starts[j] != NO_TIME), None)
+        if reference is None:
+            starts[i] = ends[i] = NO_TIME
+            continue
+
+        shifts = [shift for shift in (0, 720) if start + shift < 1440 and (end == NO_TIME or end + shift <= 1440)]
+        shift = min(shifts, key=lambda shift: (abs(start + shift - reference), start + shift < reference))
+        starts[i] = start + shift
+        if end != NO_TIME:
+            ends[i] = end + shift
+
+
+def format_minutes(minutes):
+    """Formats minutes after midnight as a 12-hour clock time, e.g. "1:30 PM"."""
+    if minutes == NO_TIME:
+        return ""
+    hour, minute = divmod(minutes, 60)
+    meridiem = "AM" if hour < 12 else "PM"
+    return f"{hour % 12 or 12}:{minute:02d} {meridiem}"
+
+
+def format_duration(minutes):
+    """Formats a duration in minutes, e.g. "45 min", "1 h" or "1 h 30 min"."""
+    if minutes is None or minutes < 0:
+        return ""
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours} h {minutes} min"
+    if hours:
+        return f"{hours} h"
+    return f"{minutes} min"
+
+
+def _sweep(starts, ends, offset, count):
+    """
+    Finds overlaps and gaps among one agenda's items with a sorted-interval sweep.
+
+    Args:
+        starts, ends (array): Batch minute arrays
+        offset (int): Index of the agenda's first item in the batch arrays
+        count (int): Number of items in the agenda
+
+    Returns:
+        tuple: (overlaps, gaps) as lists of dictionaries keyed by item index
+    """
+    order = sorted(
+        (i for i in range(count) if starts[offset + i] != NO_TIME and ends[offset + i] != NO_TIME),
+        key=lambda i: (starts[offset + i], ends[offset + i]),
+    )
+
+    overlaps = []
+    gaps = []
+    latest = None  # item index with the latest end seen so far
+    for i in order:
+        start = starts[offset + i]
+        if latest is not None:
+            latest_end = ends[offset + latest]
+            if start < latest_end:
+                overlaps.append({
+                    "first": latest,
+                    "second": i,
+                    "minutes": min(latest_end, ends[offset + i]) - start,
+                })
+            elif start > latest_end:
+                gaps.append({
+                    "after": latest,
+                    "before": i,
+                    "start": format_minutes(latest_end),
+                    "end": format_minutes(start),
+                    "minutes": start - latest_end,
+                })
+        if latest is None or ends[offset + i] > ends[offset + latest]:
+            latest = i
+
+    return overlaps, gaps
+
+
+def compute_schedules(agendas):
+    """
+    Computes schedule information for a batch of agendas.
+
+    All time strings in the batch are parsed together into flat start/end minute
+    arrays; each agenda is then checked for overlaps and gaps over its slice.
+
+    Args:
+        agendas (list): Agenda dictionaries, each with an "agenda_items" list
+
+    Returns:
+        list: One schedule dictionary per agenda (see compute_schedule)
+    """
+    item_lists = [agenda.get("agenda_items") or [] for agenda in agendas]
+    times = [item.get("time", "") if isinstance(item, dict) else "" for items in item_lists for item in items]
+    starts, ends, has_meridiem = _parse_batch(times)
+
+    schedules = []
+    offset = 0
+    for items in item_lists:
+        count = len(items)
+        _resolve_meridiems(starts, ends, has_meridiem, offset, count)
+        enriched = []
+        invalid = []
+        unscheduled = []
+        scheduled_minutes = 0
+        for i, item in enumerate(items):
+            # Items that are not dictionaries have no time; pass them to the template as-is
+            if not isinstance(item, dict):
+                unscheduled.append(i)
+                enriched.append(item)
+                continue
+            item = dict(item)
+            start, end = starts[offset + i], ends[offset + i]
+            duration = end - start if start != NO_TIME and end != NO_TIME else None
+            if start == NO_TIME:
+                # A blank time is an untimed item (a break or a note), not a parse failure
+                if str(item.get("time") or "").strip():
+                    invalid.append(i)
+                else:
+                    unscheduled.append(i)
+            if duration is not None:
+                scheduled_minutes += duration
+            item["start_minutes"] = start if start != NO_TIME else None
+            item["end_minutes"] = end if end != NO_TIME else None
+            item["duration_minutes"] = duration
+            item["duration"] = format_duration(duration)
+            enriched.append(item)
+
+        overlaps, gaps = _sweep(starts, ends, offset, count)
+
+        known_starts = [s for s in starts[offset:offset + count] if s != NO_TIME]
+        known_ends = [e for e in ends[offset:offset + count] if e != NO_TIME] + known_starts
+        day_start = min(known_starts) if known_starts else NO_TIME
+        day_end = max(known_ends) if known_ends else NO_TIME
+        total_minutes = day_end - day_start if day_start != NO_TIME else 0
+
+        schedules.append({
+            "items": enriched,
+            "overlaps": overlaps,
+            "gaps": gaps,
+            "invalid": invalid,
+            "unscheduled": unscheduled,
+            "is_valid": not overlaps and not invalid,
+            "day_start": format_minutes(day_start),
+            "day_end": format_minutes(day_end),
+            "total_minutes": total_minutes,
+            "total_duration": format_duration(total_minutes),
+            "scheduled_minutes": scheduled_minutes,
+            "scheduled_duration": format_duration(scheduled_minutes),
+            "break_minutes": sum(gap["minutes"] for gap in gaps),
+        })
+        offset += count
+
+    return schedules
+
+
+def compute_schedule(data):
+    """
+    Computes schedule information for a single agenda.
+
+    Args:
+        data (dict): Agenda data with an "agenda_items" list
+
+    Returns:
+        dict: Schedule with keys:
+            items: copies of the agenda items with start_minutes, end_minutes,
+                duration_minutes and a formatted duration added; items that are
+                not dictionaries are passed through unchanged
+            overlaps: item index pairs whose time ranges overlap
+            gaps: unscheduled time between consecutive items
+            invalid: indexes of items whose time could not be parsed
+            unscheduled: indexes of items with no time at all
+            is_valid: True when there are no overlaps or unparsable times
+            day_start, day_end: formatted first start and last end
+            total_minutes, total_duration: length of the day
+            scheduled_minutes, scheduled_duration: sum of item durations
+            break_minutes: sum of the gaps
+    """
+    return compute_schedules([data])[0]
@@ -1,36 +1,61 @@
-import logging
-logging.basicConfig(level=logging.DEBUG)
+from config import LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE
+from structured_logging import configure_logging, init_request_logging, dropped_log_records
+configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE)
 
 from flask import Flask, render_template, request, send_file, jsonify
-from config import USE_AZURE_STORAGE, AZURE_STORAGE_CONNECTION_STRING, AZURE_CONTAINER_NAME
+from config import USE_AZURE_STORAGE, AZURE_STORAGE_CONNECTION_STRING, AZURE_CONTAINER_NAME, DETERMINISTIC_OUTPUT
+from config import (RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, RATE_LIMIT_KEY_HEADER, RATE_LIMIT_TRUSTED_PROXIES,
+                    RATE_LIMIT_STORE_PATH, MAX_CONCURRENT_RENDERS, RENDER_SLOTS_DIR, RENDER_QUEUE_TIMEOUT,
+                    RENDER_RETRY_AFTER)
+from admission import AdmissionController, SQLiteBucketStore, FileLockSlots, limit_renders, parse_networks
 import json
 import os
 from agenda_builder.core import create_agenda_doc
+from agenda_builder.logos import get_logo_fetcher
+from agenda_builder.reproducible import sha256_file
 from datetime import datetime
 
 try:
-    from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+    from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, ContentSettings
 except ImportError:
     pass
 
 app = Flask(__name__)
-app.logger.setLevel(logging.DEBUG)
+init_request_logging(app)
+
+admission = AdmissionController(
+    rate=RATE_LIMIT_PER_MINUTE / 60.0,
+    burst=RATE_LIMIT_BURST,
+    max_concurrent=MAX_CONCURRENT_RENDERS,
+    queue_timeout=RENDER_QUEUE_TIMEOUT,
+    busy_retry_after=RENDER_RETRY_AFTER,
+    store=SQLiteBucketStore(RATE_LIMIT_STORE_PATH) if RATE_LIMIT_STORE_PATH else None,
+    slots=FileLockSlots(RENDER_SLOTS_DIR, MAX_CONCURRENT_RENDERS) if RENDER_SLOTS_DIR else None
+)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/admission-stats')
+def admission_stats():
+    # Per worker: under gunicorn each call reports whichever worker handled it
+    stats = admission.stats()
+    stats["log_records_dropped"] = dropped_log_records()
+    return jsonify(stats)
+
 @app.route('/generate', methods=['POST'])
+@limit_renders(admission, RATE_LIMIT_KEY_HEADER, parse_networks(RATE_LIMIT_TRUSTED_PROXIES))
 def generate():
     json_data = request.form.get('json_data')
     if not json_data:
-        app.logger.error(f"Missing JSON data. Form data: {request.form}")
+        app.logger.error("Missing JSON data. Form data: %s", request.form)
         return "Invalid JSON data", 400
 
     try:
         agenda_data = json.loads(json_data)
     except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode error: {str(e)}")
+        app.logger.error("JSON decode error: %s", e)
         return "Error decoding JSON", 400
 
     template_locations = [
@@ -44,11 +69,11 @@ def generate():
     for location in template_locations:
         if os.path.exists(location):
             template_path = location
-            app.logger.info(f"Found template at: {template_path}")
+            app.logger.debug("Found template at: %s", template_path)
             break
     
     if not template_path:
-        app.logger.error(f"Template file not found. Tried: {template_locations}")
+        app.logger.error("Template file not found. Tried: %s", template_locations)
         return "Template file not found. Make sure you have a template file named 'DATE-CUST-TOPICAgenda.docx' in the templates directory.", 500
         
     try:
@@ -66,40 +91,51 @@ def generate():
             if logo_file.filename:
                 content_type = logo_file.content_type
                 if not content_type or not content_type.startswith('image/'):
-                    app.logger.warning(f"File doesn't appear to be an image: {content_type}")
+                    app.logger.warning("File doesn't appear to be an image: %s", content_type)
                 else:
                     temp_logo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_logos')
                     os.makedirs(temp_logo_dir, exist_ok=True)
                     
                     logo_temp_path = os.path.join(temp_logo_dir, f"logo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
                     logo_file.save(logo_temp_path)
-                    app.logger.info(f"Saved uploaded logo to: {logo_temp_path}")
+                    app.logger.debug("Saved uploaded logo to: %s", logo_temp_path)
                     
                     if os.path.exists(logo_temp_path) and os.path.getsize(logo_temp_path) > 0:
                         logo_path = logo_temp_path
-                        app.logger.info(f"Logo file verified: {logo_path} (size: {os.path.getsize(logo_path)} bytes)")
+                        app.logger.debug("Logo file verified: %s", logo_path)
                     else:
-                        app.logger.error(f"Logo file not created properly: {logo_temp_path}")
+                        app.logger.error("Logo file not created properly: %s", logo_temp_path)
+        
+        if not logo_path:
+            # A suggested logo URL, with the lookup's additional results as fallbacks
+            logo_url = request.form.get('logoUrl') or agenda_data.get('logo_url')
+            logo_candidates = request.form.getlist('logoCandidates') or agenda_data.get('logo_candidates') or []
+            if not isinstance(logo_candidates, list):
+                logo_candidates = []
+            # Capped like the lookup's additionalResults, since each one is an outbound fetch
+            logo_candidates = logo_candidates[:5]
+            if logo_url or logo_candidates:
+                # Bounded, since the request already holds a render slot
+                logo_path = get_logo_fetcher().fetch_first([logo_url] + logo_candidates, timeout=5)
+                app.logger.debug("Fetched logo from URL: %s", logo_path)
         
-        app.logger.info(f"Calling create_agenda_doc with logo_path: {logo_path}")
+        app.logger.debug("Calling create_agenda_doc with logo_path: %s", logo_path)
         
         try:
-            create_agenda_doc(agenda_data, template_path, output_path, logo_path)
+            create_agenda_doc(agenda_data, template_path, output_path, logo_path, deterministic=DETERMINISTIC_OUTPUT)
         except Exception as e:
-            app.logger.warning(f"Document generation with logo failed: {str(e)}")
+            app.logger.warning("Document generation with logo failed: %s", e)
             app.logger.info("Trying again without logo")
-            create_agenda_doc(agenda_data, template_path, output_path, None)
+            create_agenda_doc(agenda_data, template_path, output_path, None, deterministic=DETERMINISTIC_OUTPUT)
         
         if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            app.logger.error(f"Output file not created properly at: {output_path}")
+            app.logger.error("Output file not created properly at: %s", output_path)
             return "Error generating document", 500
             
-        app.logger.info(f"Document generated successfully at: {output_path}")
-        
-        app.logger.debug(f"About to send file: {output_path}, exists={os.path.exists(output_path)}, size={os.path.getsize(output_path)}")
+        app.logger.info("Document generated successfully at: %s", output_path)
         
         if USE_AZURE_STORAGE:
-            app.logger.info("Azure Storage enabled. Uploading file to Blob Storage.")
+            app.logger.debug("Azure Storage enabled. Uploading file to Blob Storage.")
             connection_string = AZURE_STORAGE_CONNECTION_STRING
             container_name = AZURE_CONTAINER_NAME
             if not connection_string:
@@ -111,9 +147,27 @@ def generate():
                 container_client = blob_service_client.get_container_client(container_name)
                 container_client.create_container(exist_ok=True)
                 
-                blob_name = os.path.basename(output_path)
-                with open(output_path, "rb") as data:
-                    container_client.upload_blob(blob_name, data, overwrite=True)
+                if DETERMINISTIC_OUTPUT:
+                    # Identical agendas produce identical bytes, so the content hash names
+                    # the blob: it is uploaded once and can be cached indefinitely
+                    blob_name = f"{sha256_file(output_path)}.docx"
+                    blob_client = container_client.get_blob_client(blob_name)
+                    if blob_client.exists():
+                        app.logger.info("Identical document already stored as: %s", blob_name)
+                    else:
+                        with open(output_path, "rb") as data:
+                            blob_client.upload_blob(
+                                data,
+                                overwrite=True,
+                                content_settings=ContentSettings(
+                                    content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                                    cache_control='public, max-age=31536000, immutable'
+                                )
+                            )
+                else:
+                    blob_name = os.path.basename(output_path)
+                    with open(output_path, "rb") as data:
+                        container_client.upload_blob(blob_name, data, overwrite=True)
                 
                 sas_token = generate_blob_sas(
                     account_name=blob_service_client.account_name,
@@ -124,11 +178,11 @@ def generate():
                     expiry=datetime.utcnow().replace(hour=23, minute=59, second=59)
                 )
                 blob_url = f"{container_client.url}/{blob_name}?{sas_token}"
-                app.logger.info(f"Document uploaded to: {blob_url}")
+                app.logger.info("Document uploaded to: %s", blob_url)
                 
                 return jsonify({"downloadUrl": blob_url})
             except Exception as e:
-                app.logger.error(f"Error uploading file to Azure: {str(e)}")
+                app.logger.error("Error uploading file to Azure: %s", e)
                 return f"Error uploading file to Azure: {str(e)}", 500
         else:
             try:
@@ -138,7 +192,7 @@ def generate():
                 date_str = ''.join(c if c.isalnum() or c in ' -_' else '_' for c in date_str)
                 filename = f"{date_str}-{customer}Agenda.docx"
                 
-                app.logger.info(f"Sending file with name: {filename}")
+                app.logger.debug("Sending file with name: %s", filename)
                 
                 response = send_file(
                     output_path,
@@ -148,15 +202,15 @@ def generate():
                 
                 response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
                 
-                app.logger.debug(f"Content-Disposition header: {response.headers.get('Content-Disposition')}")
+                app.logger.debug("Content-Disposition header: %s", response.headers.get('Content-Disposition'))
                 
                 return response
             except Exception as e:
-                app.logger.error(f"Error sending file: {str(e)}")
+                app.logger.error("Error sending file: %s", e)
                 return f"Error downloading document: {str(e)}", 500
         
     except Exception as e:
-        app.logger.error(f"Error in document generation: {str(e)}")
+        app.logger.error("Error in document generation: %s", e)
         app.logger.exception("Full exception details:")
         return f"Error generating document: {str(e)}", 500
 
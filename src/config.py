@@ -1,5 +1,32 @@
 import os
+import tempfile
 
 USE_AZURE_STORAGE = os.environ.get("USE_AZURE_STORAGE", "False").lower() == "true"
 AZURE_STORAGE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING", "")
 AZURE_CONTAINER_NAME = os.environ.get("AZURE_CONTAINER_NAME", "agenda-docs")
+DETERMINISTIC_OUTPUT = os.environ.get("DETERMINISTIC_OUTPUT", "True").lower() == "true"
+
+# Admission control for /generate
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "10"))
+# Comma-separated addresses/CIDR ranges of our own proxies (e.g. the App Service front
+# ends or a gateway). X-Forwarded-For and RATE_LIMIT_KEY_HEADER are only read from
+# requests whose connecting peer is in this list; otherwise clients are limited by the
+# peer address, since they could send new header values with every request.
+RATE_LIMIT_TRUSTED_PROXIES = os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "")
+# Rate limit by a client key header (e.g. an API key) instead of the client address.
+# The trusted proxy must verify the key and overwrite any value the client sent.
+RATE_LIMIT_KEY_HEADER = os.environ.get("RATE_LIMIT_KEY_HEADER", "")
+RATE_LIMIT_STORE_PATH = os.environ.get("RATE_LIMIT_STORE_PATH", "")
+# Concurrent renders allowed on the whole host, shared by all gunicorn workers through
+# lock files in RENDER_SLOTS_DIR. Set RENDER_SLOTS_DIR to "" to cap each worker separately
+# instead (then the host runs up to workers x MAX_CONCURRENT_RENDERS at once).
+MAX_CONCURRENT_RENDERS = int(os.environ.get("MAX_CONCURRENT_RENDERS", str(os.cpu_count() or 1)))
+RENDER_SLOTS_DIR = os.environ.get("RENDER_SLOTS_DIR", os.path.join(tempfile.gettempdir(), "agenda-render-slots"))
+RENDER_QUEUE_TIMEOUT = float(os.environ.get("RENDER_QUEUE_TIMEOUT", "0.5"))
+RENDER_RETRY_AFTER = int(os.environ.get("RENDER_RETRY_AFTER", "2"))
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01"))
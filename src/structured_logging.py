@@ -0,0 +1,243 @@
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_debug_sampled = contextvars.ContextVar('debug_sampled', default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+_handler = None
+
+
+def get_request_id():
+    """Returns the ID of the request being handled, or None outside a request."""
+    return _request_id.get()
+
+
+def start_request(request_id=None):
+    """
+    Marks the start of a request for logging.
+
+    Args:
+        request_id (str): ID to attach to log records (generated if None)
+
+    Returns:
+        str: The request ID
+    """
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    _debug_sampled.set(None)
+    return request_id
+
+
+def end_request():
+    """Clears the request context set by start_request."""
+    _request_id.set(None)
+    _debug_sampled.set(None)
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current request ID to each record."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps only a sample of DEBUG records.
+
+    Inside a request the decision is made once, on its first DEBUG record, so a
+    sampled request keeps all of its debug output; elsewhere each record is sampled.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        sampled = _debug_sampled.get()
+        if sampled is None:
+            sampled = random.random() < self.rate
+            if _request_id.get() is not None:
+                _debug_sampled.set(sampled)
+        return sampled
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a background listener without formatting or blocking.
+
+    Records are queued as-is, so message formatting happens on the listener thread.
+    When the queue is full the record is dropped and counted rather than waiting;
+    once there is room again a WARNING with the number dropped is logged, at most
+    every report_interval seconds.
+    """
+
+    def __init__(self, log_queue, report_interval=60.0):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.report_interval = report_interval
+        self._reported = 0
+        self._last_report = None
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        self._report_dropped()
+
+    def _report_dropped(self):
+        with self._lock:
+            unreported = self.dropped - self._reported
+            now = time.monotonic()
+            if not unreported or (self._last_report is not None and now - self._last_report < self.report_interval):
+                return
+            previous = self._reported, self._last_report
+            self._reported = self.dropped
+            self._last_report = now
+        report = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                   "Dropped %s log records because the log queue was full",
+                                   (unreported,), None)
+        report.dropped_total = self.dropped
+        try:
+            self.queue.put_nowait(report)
+        except queue.Full:
+            # Try again with the next record
+            with self._lock:
+                self._reported, self._last_report = previous
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text format for local development, including the request ID."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = None
+        return super().format(record)
+
+
+def configure_logging(level="INFO", fmt="json", debug_sample_rate=1.0, queue_size=10000, stream=None):
+    """
+    Routes all logging through a bounded queue to a background writer thread.
+
+    Safe to call more than once; later calls replace the previous configuration.
+
+    Args:
+        level (str): Root log level
+        fmt (str): "json" for structured output, anything else for plain text
+        debug_sample_rate (float): Fraction of DEBUG records (or requests) to keep
+        queue_size (int): Records buffered before new ones are dropped
+        stream: Output stream (stderr if None)
+
+    Returns:
+        NonBlockingQueueHandler: The handler installed on the root logger
+    """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    _handler = handler
+    return handler
+
+
+def dropped_log_records():
+    """Returns how many records this process has dropped because the log queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def shutdown_logging():
+    """Stops the background writer after flushing queued records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def init_request_logging(app, header='X-Request-ID'):
+    """
+    Gives each Flask request an ID, taken from the request header when present,
+    attaches it to log records and echoes it in the response.
+    """
+    from flask import request, g
+
+    @app.before_request
+    def _start_request_logging():
+        g.request_id = start_request((request.headers.get(header) or '')[:128])
+
+    @app.after_request
+    def _add_request_id_header(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[header] = request_id
+        return response
+
+    @app.teardown_request
+    def _end_request_logging(exc):
+        end_request()
@@ -0,0 +1,264 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import subprocess
+from unittest.mock import MagicMock
+
+# Add the src directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from flask import Flask
+from admission import (AdmissionController, MemoryBucketStore, SQLiteBucketStore, Rejected,
+                       client_id_from_request, limit_renders, parse_networks, FileLockSlots)
+
+class BucketStoreTests(unittest.TestCase):
+
+    def check_store(self, store):
+        # Burst of 2, refilling one token per second
+        self.assertEqual(store.take("a", 2, 1.0, now=100.0), (True, 0))
+        self.assertEqual(store.take("a", 2, 1.0, now=100.0), (True, 0))
+        self.assertEqual(store.take("a", 2, 1.0, now=100.0), (False, 1))
+        # Other clients have their own bucket
+        self.assertEqual(store.take("b", 2, 1.0, now=100.0), (True, 0))
+        # One token is back after a second
+        self.assertEqual(store.take("a", 2, 1.0, now=101.0), (True, 0))
+
+    def test_memory_store(self):
+        """Test the in-process token bucket"""
+        self.check_store(MemoryBucketStore())
+
+    def test_sqlite_store(self):
+        """Test the SQLite token bucket shared between processes"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.check_store(SQLiteBucketStore(os.path.join(temp_dir, 'buckets.db')))
+
+    def test_sqlite_store_prunes_idle_buckets(self):
+        """Test that buckets idle long enough to be full again are deleted"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = SQLiteBucketStore(os.path.join(temp_dir, 'buckets.db'))
+            store._last_prune = 0.0
+            for n in range(5):
+                store.take(f"client-{n}", 2, 1.0, now=100.0)
+            store.take("recent", 2, 1.0, now=1000.0)
+            rows = store._connect().execute("SELECT key FROM buckets").fetchall()
+            self.assertEqual(rows, [("recent",)])
+
+class AdmissionControllerTests(unittest.TestCase):
+
+    def test_rate_limited(self):
+        """Test that a client over its rate gets a 429 with Retry-After"""
+        controller = AdmissionController(rate=0.1, burst=1, max_concurrent=2)
+        with controller.admit("client"):
+            pass
+        with self.assertRaises(Rejected) as ctx:
+            with controller.admit("client"):
+                pass
+        self.assertEqual(ctx.exception.status, 429)
+        self.assertEqual(ctx.exception.retry_after, 10)
+        self.assertEqual(controller.stats()["rate_limited"], 1)
+
+    def test_overloaded(self):
+        """Test that requests are shed with a 503 when all render slots are busy"""
+        controller = AdmissionController(rate=0, burst=0, max_concurrent=1, busy_retry_after=3)
+        entered = threading.Event()
+        release = threading.Event()
+
+        def render():
+            with controller.admit("first"):
+                entered.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=render)
+        worker.start()
+        entered.wait(5)
+        try:
+            with self.assertRaises(Rejected) as ctx:
+                with controller.admit("second"):
+                    pass
+        finally:
+            release.set()
+            worker.join()
+
+        self.assertEqual(ctx.exception.status, 503)
+        self.assertEqual(ctx.exception.retry_after, 3)
+        stats = controller.stats()
+        self.assertEqual(stats["overloaded"], 1)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["shed"], 1)
+        self.assertEqual(stats["active"], 0)
+        self.assertEqual(stats["pid"], os.getpid())
+
+    def test_errors_release_slot(self):
+        """Test that a failing render frees its slot"""
+        controller = AdmissionController(rate=0, burst=0, max_concurrent=1)
+        with self.assertRaises(ValueError):
+            with controller.admit("client"):
+                raise ValueError("render failed")
+        with controller.admit("client"):
+            pass
+        self.assertEqual(controller.stats()["errored"], 1)
+
+@unittest.skipIf(sys.platform == 'win32', "file lock slots need fcntl")
+class FileLockSlotsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_slots_shared_between_processes(self):
+        """Test that a slot held by another worker process counts against the cap"""
+        src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+        holder = subprocess.Popen(
+            [sys.executable, '-c',
+             'import sys; from admission import FileLockSlots; '
+             f'token = FileLockSlots({self.temp_dir.name!r}, 1).acquire(0); '
+             'print(token is not None, flush=True); sys.stdin.read()'],
+            cwd=src_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            self.assertEqual(holder.stdout.readline().strip(), 'True')
+            slots = FileLockSlots(self.temp_dir.name, 1)
+            self.assertIsNone(slots.acquire(0))
+        finally:
+            holder.communicate('')
+
+        # The slot is freed when the holding process exits
+        token = slots.acquire(1)
+        self.assertIsNotNone(token)
+        slots.release(token)
+
+    def test_cap_applies_within_process(self):
+        """Test that two controllers sharing the directory share the cap"""
+        first = AdmissionController(rate=0, burst=0, max_concurrent=1,
+                                    slots=FileLockSlots(self.temp_dir.name, 1))
+        second = AdmissionController(rate=0, burst=0, max_concurrent=1,
+                                     slots=FileLockSlots(self.temp_dir.name, 1))
+        with first.admit("a"):
+            with self.assertRaises(Rejected) as ctx:
+                with second.admit("b"):
+                    pass
+            self.assertEqual(ctx.exception.status, 503)
+        with second.admit("b"):
+            pass
+
+class LimitRendersTests(unittest.TestCase):
+
+    def test_outcomes_counted_from_response_status(self):
+        """Test that views returning errors count as errored, not completed"""
+        controller = AdmissionController(rate=0, burst=0, max_concurrent=2)
+        app = Flask(__name__)
+
+        @app.route('/ok')
+        @limit_renders(controller)
+        def ok():
+            return "ok"
+
+        @app.route('/bad-input')
+        @limit_renders(controller)
+        def bad_input():
+            return "Invalid JSON data", 400
+
+        @app.route('/failed')
+        @limit_renders(controller)
+        def failed():
+            return "Error generating document", 500
+
+        client = app.test_client()
+        self.assertEqual(client.get('/ok').status_code, 200)
+        self.assertEqual(client.get('/bad-input').status_code, 400)
+        self.assertEqual(client.get('/failed').status_code, 500)
+
+        stats = controller.stats()
+        self.assertEqual(stats["admitted"], 3)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["errored"], 1)
+        self.assertEqual(stats["active"], 0)
+
+    def test_rejection_response(self):
+        """Test that a rate-limited request gets a 429 with Retry-After"""
+        controller = AdmissionController(rate=0.5, burst=1, max_concurrent=2)
+        app = Flask(__name__)
+
+        @app.route('/generate')
+        @limit_renders(controller)
+        def generate():
+            return "ok"
+
+        client = app.test_client()
+        self.assertEqual(client.get('/generate').status_code, 200)
+        response = client.get('/generate')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '2')
+
+class ClientIdTests(unittest.TestCase):
+
+    trusted = parse_networks('10.1.0.0/16')
+
+    def make_request(self, headers, remote_addr='10.0.0.1'):
+        request = MagicMock()
+        request.headers = headers
+        request.remote_addr = remote_addr
+        return request
+
+    def test_forwarded_for_from_trusted_proxy(self):
+        """Test that the rightmost untrusted X-Forwarded-For entry is the client"""
+        request = self.make_request({'X-Forwarded-For': '198.51.100.1, 203.0.113.7:51234, 10.1.0.9'},
+                                    remote_addr='10.1.2.3')
+        self.assertEqual(client_id_from_request(request, trusted_proxies=self.trusted), '203.0.113.7')
+
+    def test_forwarded_for_ignored_from_untrusted_peer(self):
+        """Test that a client cannot pick its own bucket by rotating X-Forwarded-For"""
+        for n in range(3):
+            request = self.make_request({'X-Forwarded-For': f'198.51.100.{n}'}, remote_addr='203.0.113.99')
+            self.assertEqual(client_id_from_request(request, trusted_proxies=self.trusted), '203.0.113.99')
+        # Without any trusted proxy the header is never used
+        request = self.make_request({'X-Forwarded-For': '198.51.100.1'})
+        self.assertEqual(client_id_from_request(request), '10.0.0.1')
+
+    def test_key_header_from_trusted_gateway(self):
+        """Test that a gateway appending the client address still has its key honoured"""
+        request = self.make_request({'X-Api-Key': 'customer-a', 'X-Forwarded-For': '203.0.113.7'},
+                                    remote_addr='10.1.2.3')
+        self.assertEqual(client_id_from_request(request, 'X-Api-Key', self.trusted), 'key:customer-a')
+
+    def test_key_header_ignored_from_untrusted_client(self):
+        """Test that a client cannot pick its own bucket by rotating the key header"""
+        for key in ('a', 'b', 'c'):
+            request = self.make_request({'X-Api-Key': key}, remote_addr='203.0.113.99')
+            self.assertEqual(client_id_from_request(request, 'X-Api-Key', self.trusted), '203.0.113.99')
+        # Nor by claiming to be a trusted gateway in X-Forwarded-For
+        for key in ('a', 'b', 'c'):
+            request = self.make_request({'X-Api-Key': key, 'X-Forwarded-For': '10.1.2.3'},
+                                        remote_addr='203.0.113.99')
+            self.assertEqual(client_id_from_request(request, 'X-Api-Key', self.trusted), '203.0.113.99')
+        # Without any trusted gateway the header is never used
+        request = self.make_request({'X-Api-Key': 'a'}, remote_addr='10.1.2.3')
+        self.assertEqual(client_id_from_request(request, 'X-Api-Key'), '10.1.2.3')
+
+    def test_remote_addr_fallback(self):
+        self.assertEqual(client_id_from_request(self.make_request({})), '10.0.0.1')
+
+    def test_spoofed_forwarded_for_is_rate_limited(self):
+        """Test that rotating X-Forwarded-For through a Flask view still hits the limit"""
+        controller = AdmissionController(rate=0.01, burst=2, max_concurrent=2)
+        app = Flask(__name__)
+
+        @app.route('/generate')
+        @limit_renders(controller, trusted_proxies=self.trusted)
+        def generate():
+            return "ok"
+
+        client = app.test_client()
+        statuses = [
+            client.get('/generate', headers={'X-Forwarded-For': f'198.51.100.{n}'},
+                       environ_base={'REMOTE_ADDR': '203.0.113.99'}).status_code
+            for n in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 429, 429])
+
+if __name__ == '__main__':
+    unittest.main()
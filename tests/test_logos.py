@@ -0,0 +1,192 @@
+import unittest
+import unittest.mock
+import sys
+import os
+import tempfile
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add the src directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from agenda_builder.logos import LogoFetcher, BlockedURLError
+
+PNG_DATA = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+class StubLogoHandler(BaseHTTPRequestHandler):
+    """Serves a PNG at /logo.png with an ETag, a slow PNG, a redirect, and HTML or errors elsewhere."""
+
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path.startswith('/logo.png'):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(PNG_DATA)))
+            self.end_headers()
+            self.wfile.write(PNG_DATA)
+        elif self.path == '/slow.png':
+            time.sleep(2)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(PNG_DATA)))
+            self.end_headers()
+            self.wfile.write(PNG_DATA)
+        elif self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', f"http://localhost:{self.server.server_port}/logo.png")
+            self.end_headers()
+        elif self.path == '/page.html':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b'<html></html>')
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class LogoFetcherTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubLogoHandler)
+        cls.server.daemon_threads = True
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubLogoHandler.requests_seen = []
+        self.cache_dir = tempfile.TemporaryDirectory()
+        # The stub server is on loopback, which is refused unless explicitly allowed
+        self.fetcher = self.make_fetcher(max_age=3600)
+
+    def tearDown(self):
+        for fetcher in self.fetchers:
+            fetcher.close()
+        self.cache_dir.cleanup()
+
+    def make_fetcher(self, **kwargs):
+        kwargs.setdefault('allow_private', True)
+        fetcher = LogoFetcher(cache_dir=self.cache_dir.name, **kwargs)
+        self.fetchers = getattr(self, 'fetchers', []) + [fetcher]
+        return fetcher
+
+    def test_fetch_caches_image(self):
+        """Test that a fetched logo is cached and reused without another request"""
+        url = f"{self.base_url}/logo.png"
+        path = self.fetcher.fetch(url)
+        self.assertIsNotNone(path)
+        self.assertTrue(path.endswith('.png'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), PNG_DATA)
+
+        self.assertEqual(self.fetcher.fetch(url), path)
+        self.assertEqual(len(StubLogoHandler.requests_seen), 1)
+
+    def test_revalidates_with_etag(self):
+        """Test that an expired cache entry is revalidated with If-None-Match"""
+        url = f"{self.base_url}/logo.png"
+        path = self.fetcher.fetch(url)
+
+        expired = self.make_fetcher(max_age=0)
+        self.assertEqual(expired.fetch(url), path)
+        self.assertEqual(StubLogoHandler.requests_seen[-1], ('/logo.png', '"v1"'))
+
+    def test_rejects_non_images_and_errors(self):
+        """Test that non-image responses and HTTP errors return None"""
+        self.assertIsNone(self.fetcher.fetch(f"{self.base_url}/page.html"))
+        self.assertIsNone(self.fetcher.fetch(f"{self.base_url}/missing.png"))
+
+    def test_rejects_oversized_images(self):
+        """Test that images over max_bytes are not cached"""
+        small = self.make_fetcher(max_bytes=16)
+        self.assertIsNone(small.fetch(f"{self.base_url}/logo.png"))
+
+    def test_fetch_first_prefers_earliest_candidate(self):
+        """Test that candidates are fetched together and the first success wins"""
+        candidates = [
+            f"{self.base_url}/missing.png",
+            f"{self.base_url}/logo.png?option=1",
+            f"{self.base_url}/logo.png?option=2",
+        ]
+        results = self.fetcher.fetch_many(candidates)
+        self.assertIsNone(results[candidates[0]])
+        self.assertIsNotNone(results[candidates[2]])
+
+        path = self.fetcher.fetch_first(candidates)
+        self.assertEqual(path, results[candidates[1]])
+
+    def test_fetch_first_does_not_wait_for_slow_fallbacks(self):
+        """Test that a slow, less preferred candidate does not delay the result"""
+        started = time.monotonic()
+        path = self.fetcher.fetch_first([f"{self.base_url}/logo.png", f"{self.base_url}/slow.png"])
+        self.assertIsNotNone(path)
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_loopback_refused_by_default(self):
+        """Test that URLs resolving to loopback are not contacted without opting in"""
+        fetcher = self.make_fetcher(allow_private=False)
+        url = f"{self.base_url}/logo.png"
+        with self.assertRaises(BlockedURLError):
+            fetcher.check_url(url)
+        self.assertIsNone(fetcher.fetch(url))
+        self.assertEqual(StubLogoHandler.requests_seen, [])
+
+    def test_non_public_addresses_refused(self):
+        """Test that metadata, private and non-http URLs are refused"""
+        fetcher = self.make_fetcher(allow_private=False)
+        for url in ("http://169.254.169.254/metadata", "http://10.0.0.5/logo.png",
+                    "http://[::1]/logo.png", "file:///etc/passwd", "ftp://example.com/logo.png"):
+            with self.assertRaises(BlockedURLError, msg=url):
+                fetcher.check_url(url)
+
+    def test_malformed_url_returns_none(self):
+        """Test that an unparsable URL is refused instead of raising"""
+        fetcher = self.make_fetcher(allow_private=False)
+        with self.assertRaises(BlockedURLError):
+            fetcher.check_url("http://[::1/logo.png")
+        self.assertIsNone(fetcher.fetch("http://[::1/logo.png"))
+        self.assertIsNone(fetcher.fetch_first(["http://[::1/logo.png"]))
+
+    def test_cache_write_error_returns_none(self):
+        """Test that a failure writing the cache does not propagate"""
+        url = f"{self.base_url}/logo.png"
+        with unittest.mock.patch.object(self.fetcher, '_write_atomic', side_effect=OSError("disk full")):
+            self.assertIsNone(self.fetcher.fetch(url))
+
+    def test_allowlist_applies_to_redirects(self):
+        """Test that a redirect to a host outside the allowlist is not followed"""
+        fetcher = self.make_fetcher(allowed_hosts=['127.0.0.1'])
+        self.assertIsNotNone(fetcher.fetch(f"{self.base_url}/logo.png"))
+        # /redirect points at localhost, which is not on the allowlist
+        self.assertIsNone(fetcher.fetch(f"{self.base_url}/redirect"))
+        self.assertNotIn(('/logo.png', None), StubLogoHandler.requests_seen[1:])
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test that the disk cache stays within max_entries"""
+        fetcher = self.make_fetcher(max_entries=3)
+        for i in range(6):
+            self.assertIsNotNone(fetcher.fetch(f"{self.base_url}/logo.png?v={i}"))
+        metadata = [name for name in os.listdir(self.cache_dir.name) if name.endswith('.json')]
+        images = [name for name in os.listdir(self.cache_dir.name) if name.endswith('.png')]
+        self.assertLessEqual(len(metadata), 3)
+        self.assertEqual(len(images), len(metadata))
+
+if __name__ == '__main__':
+    unittest.main()
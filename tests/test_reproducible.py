@@ -0,0 +1,138 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import shutil
+import zipfile
+
+# Add the src directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from agenda_builder.reproducible import ZIP_EPOCH, normalize_docx, sha256_file
+from agenda_builder.core import create_agenda_doc
+
+TEMPLATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../templates/DATE-CUST-TOPICAgenda.docx'))
+
+RELS = b'<Relationships><Relationship Id="rId1" Target="media/image1.png"/></Relationships>'
+CONTENT_TYPES = b'<Types><Override PartName="/word/media/image1.png" ContentType="image/png"/></Types>'
+
+class NormalizeDocxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_docx(self, name, parts):
+        path = os.path.join(self.temp_dir.name, name)
+        with zipfile.ZipFile(path, 'w') as z:
+            for part_name, data in parts:
+                z.writestr(part_name, data)
+        return path
+
+    def test_same_content_same_bytes(self):
+        """Test that part order and zip timestamps do not affect the output"""
+        parts = [
+            ('[Content_Types].xml', CONTENT_TYPES),
+            ('word/document.xml', b'<document/>'),
+            ('word/_rels/document.xml.rels', RELS),
+            ('word/media/image1.png', b'logo bytes'),
+        ]
+        first = self.make_docx('first.docx', parts)
+        time.sleep(2)  # zip timestamps have a two second resolution
+        second = self.make_docx('second.docx', list(reversed(parts)))
+
+        self.assertNotEqual(sha256_file(first), sha256_file(second))
+        self.assertEqual(normalize_docx(first), normalize_docx(second))
+        self.assertEqual(sha256_file(first), sha256_file(second))
+
+    def test_media_named_by_content(self):
+        """Test that media parts are renamed by content hash and references follow"""
+        path = self.make_docx('doc.docx', [
+            ('[Content_Types].xml', CONTENT_TYPES),
+            ('word/_rels/document.xml.rels', RELS),
+            ('word/document.xml', b'<document/>'),
+            ('word/media/image1.png', b'logo bytes'),
+        ])
+        normalize_docx(path)
+
+        with zipfile.ZipFile(path) as z:
+            names = z.namelist()
+            media = [n for n in names if n.startswith('word/media/')]
+            self.assertEqual(len(media), 1)
+            self.assertNotIn('word/media/image1.png', names)
+            self.assertEqual(names[0], '[Content_Types].xml')
+            self.assertIn(f'Target="{media[0][len("word/"):]}"'.encode(), z.read('word/_rels/document.xml.rels'))
+            self.assertIn(f'PartName="/{media[0]}"'.encode(), z.read('[Content_Types].xml'))
+            self.assertEqual(z.read(media[0]), b'logo bytes')
+            self.assertTrue(all(info.date_time == ZIP_EPOCH for info in z.infolist()))
+
+    def test_identical_media_kept_as_separate_parts(self):
+        """Test that media parts with the same bytes keep distinct names and overrides"""
+        path = self.make_docx('doc.docx', [
+            ('[Content_Types].xml', b'<Types>'
+                                    b'<Override PartName="/word/media/image1.png" ContentType="image/png"/>'
+                                    b'<Override PartName="/word/media/image2.png" ContentType="image/png"/>'
+                                    b'</Types>'),
+            ('word/_rels/document.xml.rels', b'<Relationships>'
+                                             b'<Relationship Id="rId1" Target="media/image1.png"/>'
+                                             b'<Relationship Id="rId2" Target="media/image2.png"/>'
+                                             b'</Relationships>'),
+            ('word/document.xml', b'<document/>'),
+            ('word/media/image1.png', b'logo bytes'),
+            ('word/media/image2.png', b'logo bytes'),
+        ])
+        normalize_docx(path)
+
+        with zipfile.ZipFile(path) as z:
+            media = sorted(n for n in z.namelist() if n.startswith('word/media/'))
+            self.assertEqual(len(media), 2)
+            content_types = z.read('[Content_Types].xml')
+            rels = z.read('word/_rels/document.xml.rels')
+            for name in media:
+                self.assertEqual(content_types.count(f'PartName="/{name}"'.encode()), 1)
+                self.assertEqual(rels.count(f'Target="{name[len("word/"):]}"'.encode()), 1)
+
+@unittest.skipUnless(os.path.exists(TEMPLATE_PATH), "agenda template not found")
+class DeterministicRenderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def render(self, name, logo_path):
+        data = {
+            "customer": "Contoso",
+            "date": "2025-01-15",
+            "topic": "Architecture Design Session",
+            "agenda_items": [
+                {"time": "9:00 AM - 10:00 AM", "topic": "Introductions"},
+                {"time": "10:00 AM - 11:30 AM", "topic": "Discovery"},
+            ],
+        }
+        output_path = os.path.join(self.temp_dir.name, name)
+        create_agenda_doc(data, TEMPLATE_PATH, output_path, logo_path, deterministic=True)
+        return output_path
+
+    def test_same_agenda_same_bytes_with_real_template(self):
+        """Test that the rendered document does not depend on the logo's temporary path"""
+        from PIL import Image
+        logo = os.path.join(self.temp_dir.name, 'logo.png')
+        Image.new('RGB', (40, 20), (0, 120, 212)).save(logo)
+        first_logo = os.path.join(self.temp_dir.name, 'temp_logo_1.png')
+        second_logo = os.path.join(self.temp_dir.name, 'temp_logo_2.png')
+        shutil.copy(logo, first_logo)
+        shutil.copy(logo, second_logo)
+
+        first = self.render('first.docx', first_logo)
+        time.sleep(2)  # zip timestamps have a two second resolution
+        second = self.render('second.docx', second_logo)
+
+        self.assertEqual(sha256_file(first), sha256_file(second))
+
+if __name__ == '__main__':
+    unittest.main()
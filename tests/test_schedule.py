@@ -0,0 +1,151 @@
+import unittest
+import sys
+import os
+
+# Add the src directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from agenda_builder.schedule import NO_TIME, parse_time_ranges, compute_schedule, compute_schedules
+
+class ScheduleTests(unittest.TestCase):
+
+    def test_parse_time_ranges(self):
+        """Test that common time formats are parsed to minutes after midnight"""
+        starts, ends = parse_time_ranges([
+            "9:30 AM - 10:00 AM",
+            "9:30 AM – 9:45 AM",
+            "11:30 - 12:30 PM",
+            "13:00 to 14:30",
+            "10:00 AM",
+            "Lunch",
+            "",
+        ])
+        self.assertEqual(list(starts), [570, 570, 690, 780, 600, NO_TIME, NO_TIME])
+        self.assertEqual(list(ends), [600, 585, 750, 870, NO_TIME, NO_TIME, NO_TIME])
+
+    def test_reversed_range_is_invalid(self):
+        """Test that a range ending before it starts is rejected"""
+        starts, ends = parse_time_ranges(["2:00 PM - 1:00 PM"])
+        self.assertEqual(starts[0], NO_TIME)
+        self.assertEqual(ends[0], NO_TIME)
+
+    def test_compute_schedule_totals_and_gaps(self):
+        """Test durations, day totals and gap detection"""
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "9:30 AM - 10:00 AM", "topic": "Introductions"},
+                {"time": "10:00 AM - 12:00 PM", "topic": "Discovery"},
+                {"time": "1:00 PM - 2:30 PM", "topic": "Architecture"},
+            ]
+        })
+        self.assertEqual([item["duration"] for item in schedule["items"]], ["30 min", "2 h", "1 h 30 min"])
+        self.assertEqual(schedule["day_start"], "9:30 AM")
+        self.assertEqual(schedule["day_end"], "2:30 PM")
+        self.assertEqual(schedule["total_duration"], "5 h")
+        self.assertEqual(schedule["scheduled_minutes"], 240)
+        self.assertEqual(schedule["gaps"], [
+            {"after": 1, "before": 2, "start": "12:00 PM", "end": "1:00 PM", "minutes": 60}
+        ])
+        self.assertEqual(schedule["overlaps"], [])
+        self.assertTrue(schedule["is_valid"])
+
+    def test_compute_schedule_overlaps(self):
+        """Test that overlapping items are flagged regardless of input order"""
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "10:30 AM - 10:45 AM"},
+                {"time": "9:00 AM - 11:00 AM"},
+                {"time": "TBD"},
+            ]
+        })
+        self.assertEqual(schedule["overlaps"], [{"first": 1, "second": 0, "minutes": 15}])
+        self.assertEqual(schedule["invalid"], [2])
+        self.assertFalse(schedule["is_valid"])
+
+    def test_missing_meridiem_taken_from_neighbours(self):
+        """Test that a time without AM/PM in a 12-hour agenda is not read as early morning"""
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "9:00 AM - 12:00 PM", "topic": "Discovery"},
+                {"time": "1:00 - 2:30", "topic": "Architecture"},
+                {"time": "2:30 PM - 3:00 PM", "topic": "Wrap-up"},
+            ]
+        })
+        self.assertEqual(schedule["items"][1]["start_minutes"], 780)
+        self.assertEqual(schedule["items"][1]["end_minutes"], 870)
+        self.assertEqual(schedule["day_start"], "9:00 AM")
+        self.assertEqual(schedule["total_duration"], "6 h")
+        self.assertEqual(schedule["invalid"], [])
+
+        # The first item takes its reading from the next one
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "8:30 - 9:00"},
+                {"time": "9:00 AM - 10:00 AM"},
+            ]
+        })
+        self.assertEqual(schedule["day_start"], "8:30 AM")
+
+    def test_missing_meridiem_skips_untimed_neighbours(self):
+        """Test that the nearest timed item decides, and an ambiguous time with none is invalid"""
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "1:00 - 2:30", "topic": "Architecture"},
+                {"time": "", "topic": "Break"},
+                {"time": "3 PM", "topic": "Wrap-up"},
+            ]
+        })
+        self.assertEqual(schedule["items"][0]["start_minutes"], 780)
+
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "9 AM", "topic": "Kickoff"},
+                {"time": "1:00 - 2:30", "topic": "Architecture"},
+            ]
+        })
+        self.assertEqual(schedule["items"][1]["start_minutes"], 780)
+
+        schedule = compute_schedule({"agenda_items": [{"time": "1:00 - 2:30"}, {"time": "13 PM"}]})
+        self.assertEqual(schedule["invalid"], [0, 1])
+
+        # A 24-hour agenda is left alone
+        schedule = compute_schedule({"agenda_items": [{"time": "1:00 - 2:30"}]})
+        self.assertEqual(schedule["items"][0]["start_minutes"], 60)
+
+    def test_blank_times_are_unscheduled_not_invalid(self):
+        """Test that untimed items are reported separately from parse failures"""
+        schedule = compute_schedule({
+            "agenda_items": [
+                {"time": "9:00 AM - 10:00 AM", "topic": "Kickoff"},
+                {"topic": "Break"},
+                {"time": "  ", "topic": "Note"},
+                {"time": "after lunch", "topic": "Demo"},
+            ]
+        })
+        self.assertEqual(schedule["unscheduled"], [1, 2])
+        self.assertEqual(schedule["invalid"], [3])
+
+    def test_non_dict_items_pass_through(self):
+        """Test that items which are not dictionaries reach the template unchanged"""
+        items = ["Lunch", {"time": "1:00 PM - 2:00 PM", "topic": "Demo"}]
+        schedule = compute_schedule({"agenda_items": items})
+        self.assertEqual(schedule["items"][0], "Lunch")
+        self.assertEqual(schedule["items"][1]["duration"], "1 h")
+        self.assertEqual(schedule["unscheduled"], [0])
+        self.assertEqual(schedule["invalid"], [])
+
+    def test_compute_schedules_batch(self):
+        """Test that a batch keeps each agenda's items separate and inputs untouched"""
+        first = {"agenda_items": [{"time": "9:00 AM - 9:30 AM"}]}
+        second = {"agenda_items": [{"time": "2:00 PM - 3:00 PM"}, {"time": "3:00 PM - 3:15 PM"}]}
+        schedules = compute_schedules([first, {}, second])
+
+        self.assertEqual(len(schedules), 3)
+        self.assertEqual(schedules[0]["total_minutes"], 30)
+        self.assertEqual(schedules[1]["items"], [])
+        self.assertEqual(schedules[2]["total_minutes"], 75)
+        self.assertEqual(schedules[2]["gaps"], [])
+        self.assertNotIn("duration", first["agenda_items"][0])
+
+if __name__ == '__main__':
+    unittest.main()
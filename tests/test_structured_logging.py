@@ -0,0 +1,161 @@
+import unittest
+import sys
+import os
+import io
+import json
+import queue
+import logging
+import threading
+from logging.handlers import QueueListener
+
+# Add the src directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from structured_logging import (NonBlockingQueueHandler, JsonFormatter, RequestContextFilter,
+                                DebugSamplingFilter, start_request, end_request, configure_logging,
+                                shutdown_logging, dropped_log_records)
+
+class StructuredLoggingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        output = logging.StreamHandler(self.stream)
+        output.setFormatter(JsonFormatter())
+
+        self.queue = queue.Queue()
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(RequestContextFilter())
+        self.listener = QueueListener(self.queue, output)
+        self.listener.start()
+
+        self.logger = logging.getLogger(f"test.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        end_request()
+
+    def records(self):
+        self.listener.stop()
+        self.listener.start()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_output_with_request_id_and_extras(self):
+        """Test that records are JSON lines carrying the request ID and extra fields"""
+        start_request("req-1")
+        self.logger.info("Rendered %s items", 3, extra={"customer": "Contoso"})
+        end_request()
+        self.logger.info("Outside a request")
+
+        first, second = self.records()
+        self.assertEqual(first["message"], "Rendered 3 items")
+        self.assertEqual(first["level"], "INFO")
+        self.assertEqual(first["request_id"], "req-1")
+        self.assertEqual(first["customer"], "Contoso")
+        self.assertNotIn("request_id", second)
+
+    def test_formatting_happens_off_the_calling_thread(self):
+        """Test that message arguments are formatted by the listener, not the caller"""
+        formatted_on = []
+
+        class Expensive:
+            def __str__(self):
+                formatted_on.append(threading.current_thread())
+                return "expensive"
+
+        self.logger.info("Value: %s", Expensive())
+        self.assertEqual(self.records()[0]["message"], "Value: expensive")
+        self.assertNotIn(threading.current_thread(), formatted_on)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that a full queue drops records and counts them"""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        logger = logging.getLogger("test.full_queue")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            logger.warning("first")
+            logger.warning("second")
+            logger.warning("third")
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.dropped, 2)
+
+    def test_dropped_records_are_reported(self):
+        """Test that the number of dropped records is logged once the queue has room"""
+        log_queue = queue.Queue(maxsize=2)
+        handler = NonBlockingQueueHandler(log_queue, report_interval=3600)
+        logger = logging.getLogger("test.dropped_report")
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        def drain():
+            messages = []
+            while not log_queue.empty():
+                messages.append(log_queue.get_nowait().getMessage())
+            return messages
+
+        try:
+            logger.warning("first")
+            logger.warning("second")
+            logger.warning("dropped")
+            self.assertEqual(drain(), ["first", "second"])
+            logger.warning("third")
+            self.assertEqual(drain(), ["third", "Dropped 1 log records because the log queue was full"])
+            # Nothing further to report
+            logger.warning("fourth")
+            self.assertEqual(drain(), ["fourth"])
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_debug_sampling_per_request(self):
+        """Test that DEBUG records are sampled while other levels are always kept"""
+        self.handler.addFilter(DebugSamplingFilter(0.0))
+        start_request("req-2")
+        self.logger.debug("dropped")
+        self.logger.warning("kept")
+        end_request()
+        self.assertEqual([r["message"] for r in self.records()], ["kept"])
+
+        self.handler.filters[-1].rate = 1.0
+        self.logger.debug("kept when fully sampled")
+        self.assertEqual(self.records()[-1]["message"], "kept when fully sampled")
+
+class ConfigureLoggingTests(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.saved_handlers = list(root.handlers)
+        self.saved_level = root.level
+
+    def tearDown(self):
+        shutdown_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in self.saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(self.saved_level)
+
+    def test_configure_logging_routes_root_through_queue(self):
+        """Test that configure_logging installs a single queue handler on the root logger"""
+        stream = io.StringIO()
+        handler = configure_logging("INFO", "json", stream=stream)
+        configure_logging("INFO", "json", stream=stream)  # reconfiguring replaces, not duplicates
+        self.assertEqual(len(logging.getLogger().handlers), 1)
+        self.assertIsInstance(logging.getLogger().handlers[0], NonBlockingQueueHandler)
+        self.assertIsNot(handler, logging.getLogger().handlers[0])
+
+        logging.getLogger("agenda_builder.core").info("Document saved to: %s", "a.docx")
+        logging.getLogger("agenda_builder.core").debug("not enabled at INFO")
+        shutdown_logging()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line["message"] for line in lines], ["Document saved to: a.docx"])
+        self.assertEqual(dropped_log_records(), 0)
+
+if __name__ == '__main__':
+    unittest.main()